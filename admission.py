@@ -0,0 +1,264 @@
+# admission.py
+"""
+Controle de admissão de conexões e requisições dos servidores Modbus.
+
+Cada servidor tem uma Admission própria, encadeada (parent) a uma Admission
+global compartilhada pela frota. Limites com valor 0 são ilimitados.
+  - max_connections: conexões simultâneas
+  - max_inflight: requisições em processamento simultâneo (do recebimento do
+    cabeçalho MBAP até o envio da resposta); cada IP com conexões ativas tem
+    direito a uma fatia justa (max_inflight / IPs ativos), dividida entre as
+    conexões desse IP
+  - idle_timeout: conexões sem requisições por esse tempo (s) são fechadas
+
+Conexões acima do limite são recusadas no laço de accept, antes de ganharem
+uma thread: um pool pequeno e compartilhado (REJECT_WORKERS threads, até
+REJECT_BACKLOG conexões pendentes) lê a primeira requisição e responde com a
+exceção Modbus 0x06 (servidor ocupado); além disso, a conexão é só fechada.
+Requisições acima do limite recebem 0x06 na própria conexão. Os contadores de
+rejeições ficam disponíveis em stats().
+"""
+
+import collections
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from pyModbusTCP.constants import EXP_SLAVE_DEVICE_BUSY
+from pyModbusTCP.server import ModbusServer
+
+# Tempo máximo para ler a requisição de uma conexão recusada e responder "ocupado"
+REJECT_WAIT = 1.0
+# Pool compartilhado que responde às conexões recusadas
+REJECT_WORKERS = 2
+REJECT_BACKLOG = 64
+
+_reject_pool = ThreadPoolExecutor(max_workers=REJECT_WORKERS, thread_name_prefix="modbus-reject")
+_reject_slots = threading.BoundedSemaphore(REJECT_BACKLOG)
+
+
+class Admission:
+    """Limites e contadores de conexões/requisições (de um servidor ou global)."""
+
+    def __init__(self, max_connections=0, max_inflight=0, idle_timeout=0, parent=None):
+        self.max_connections = max_connections
+        self.max_inflight = max_inflight
+        self.idle_timeout = idle_timeout
+        self.parent = parent
+        self.connections = 0
+        self.inflight = 0
+        self.rejected = 0     # conexões recusadas
+        self.shed = 0         # requisições recusadas (ocupado)
+        self.idle_closed = 0  # conexões fechadas por inatividade
+        self._conn_by_ip = collections.Counter()
+        self._inflight_by_ip = collections.Counter()
+        self._lock = threading.Lock()
+
+    def _try_connect(self, client):
+        with self._lock:
+            if self.max_connections and self.connections >= self.max_connections:
+                self.rejected += 1
+                return False
+            self.connections += 1
+            self._conn_by_ip[client[0]] += 1
+            return True
+
+    def connect(self, client):
+        """Tenta admitir uma conexão (client = (ip, porta)). Retorna False se recusada."""
+        if not self._try_connect(client):
+            return False
+        if self.parent and not self.parent.connect(client):
+            self.disconnect(client, propagate=False)
+            with self._lock:
+                self.rejected += 1
+            return False
+        return True
+
+    def disconnect(self, client, propagate=True):
+        with self._lock:
+            self.connections -= 1
+            self._conn_by_ip[client[0]] -= 1
+            if self._conn_by_ip[client[0]] <= 0:
+                del self._conn_by_ip[client[0]]
+        if propagate and self.parent:
+            self.parent.disconnect(client)
+
+    def _try_begin(self, client):
+        with self._lock:
+            if self.max_inflight:
+                fair_share = max(1, self.max_inflight // max(1, len(self._conn_by_ip)))
+                if self.inflight >= self.max_inflight or self._inflight_by_ip[client[0]] >= fair_share:
+                    self.shed += 1
+                    return False
+            self.inflight += 1
+            self._inflight_by_ip[client[0]] += 1
+            return True
+
+    def begin_request(self, client):
+        """
+        Tenta admitir uma requisição da conexão (client = (ip, porta)).
+        Retorna False se deve responder 'ocupado'.
+        """
+        if not self._try_begin(client):
+            return False
+        if self.parent and not self.parent.begin_request(client):
+            self.end_request(client, propagate=False)
+            with self._lock:
+                self.shed += 1
+            return False
+        return True
+
+    def end_request(self, client, propagate=True):
+        with self._lock:
+            self.inflight -= 1
+            self._inflight_by_ip[client[0]] -= 1
+            if self._inflight_by_ip[client[0]] <= 0:
+                del self._inflight_by_ip[client[0]]
+        if propagate and self.parent:
+            self.parent.end_request(client)
+
+    def count_idle_close(self):
+        with self._lock:
+            self.idle_closed += 1
+
+    def effective_idle_timeout(self):
+        """Menor timeout ocioso configurado (próprio ou global); 0 = sem timeout."""
+        timeouts = [t for t in (self.idle_timeout, self.parent.effective_idle_timeout() if self.parent else 0) if t]
+        return min(timeouts) if timeouts else 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "connections": self.connections,
+                "inflight": self.inflight,
+                "rejected": self.rejected,
+                "shed": self.shed,
+                "idle_closed": self.idle_closed,
+            }
+
+
+class LimitedModbusServer(ModbusServer):
+    """ModbusServer com controle de admissão (ver Admission)."""
+
+    def __init__(self, *args, admission=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.admission = admission or Admission()
+        # start() instancia self.ModbusService: cada servidor usa um handler ligado à própria admissão
+        self.ModbusService = _make_service(self.admission)
+
+    def _serve(self):
+        # Executado na thread do servidor antes do serve_forever: a admissão da
+        # conexão fica no laço de accept, antes de process_request criar a thread
+        spawn = self._service.process_request
+
+        def process_request(request, client_address):
+            if not self.admission.connect(client_address):
+                _reject(request, lambda: self.is_run)
+                return
+            try:
+                spawn(request, client_address)
+            except Exception:
+                self.admission.disconnect(client_address)
+                raise
+
+        self._service.process_request = process_request
+        super()._serve()
+
+
+class IdleTimeout(ModbusServer.NetworkError):
+    """Conexão sem requisições por mais que o timeout ocioso."""
+
+
+def _recv_within(sock, size, max_wait, is_running):
+    """Como o _recv_all original, mas desiste após max_wait (s) sem receber dados."""
+    data = b""
+    last = time.monotonic()
+    while len(data) < size:
+        if not is_running():
+            raise ModbusServer.NetworkError("main server is not running")
+        if max_wait and time.monotonic() - last > max_wait:
+            raise IdleTimeout("idle timeout")
+        try:
+            chunk = sock.recv(size - len(data))
+        except socket.timeout:
+            continue
+        if not chunk:
+            raise ModbusServer.NetworkError("recv return null")
+        data += chunk
+        last = time.monotonic()
+    return data
+
+
+def _reject(sock, is_running):
+    """Entrega uma conexão recusada ao pool de rejeição; com o pool cheio, só fecha."""
+    if not _reject_slots.acquire(blocking=False):
+        sock.close()
+        return
+    try:
+        _reject_pool.submit(_reject_busy, sock, is_running)
+    except RuntimeError:  # pool encerrado (saída do interpretador)
+        _reject_slots.release()
+        sock.close()
+
+
+def _reject_busy(sock, is_running):
+    """Lê uma requisição, responde 0x06 (ocupado) e fecha a conexão."""
+    try:
+        sock.settimeout(0.2)
+        session_data = ModbusServer.SessionData()
+        session_data.request.mbap.raw = _recv_within(sock, 7, REJECT_WAIT, is_running)
+        session_data.request.pdu.raw = _recv_within(sock, session_data.request.mbap.length - 1, REJECT_WAIT, is_running)
+        session_data.set_response_mbap()
+        session_data.response.pdu.build_except(session_data.request.pdu.func_code, EXP_SLAVE_DEVICE_BUSY)
+        sock.sendall(session_data.response.raw)
+    except (ModbusServer.Error, OSError):
+        pass
+    finally:
+        sock.close()
+        _reject_slots.release()
+
+
+def _make_service(admission):
+    class LimitedModbusService(ModbusServer.ModbusService):
+
+        def _recv_all(self, size):
+            try:
+                return _recv_within(self.request, size, admission.effective_idle_timeout(),
+                                    lambda: self.server_running)
+            except IdleTimeout:
+                admission.count_idle_close()
+                raise
+
+        def handle(self):
+            """
+            Laço do ModbusService.handle original, com a requisição em processamento
+            (admission.begin_request) do cabeçalho MBAP até o envio da resposta.
+            """
+            # A conexão já foi admitida em LimitedModbusServer._serve
+            client = self.client_address
+            try:
+                session_data = ModbusServer.SessionData()
+                (session_data.client.address, session_data.client.port) = self.request.getpeername()
+                while True:
+                    session_data.new_request()
+                    session_data.request.mbap.raw = self._recv_all(7)
+                    admitted = admission.begin_request(client)
+                    try:
+                        session_data.request.pdu.raw = self._recv_all(session_data.request.mbap.length - 1)
+                        session_data.set_response_mbap()
+                        if admitted:
+                            self.server.engine(session_data)
+                        else:
+                            session_data.response.pdu.build_except(session_data.request.pdu.func_code,
+                                                                   EXP_SLAVE_DEVICE_BUSY)
+                        self._send_all(session_data.response.raw)
+                    finally:
+                        if admitted:
+                            admission.end_request(client)
+            except (ModbusServer.Error, OSError):
+                self.request.close()
+            finally:
+                admission.disconnect(client)
+
+    return LimitedModbusService
@@ -0,0 +1,96 @@
+# bench_memory.py
+"""
+Benchmark de memória dos bancos de dados dos servidores.
+
+Mede, sem iniciar os servidores (nenhuma porta é aberta):
+  - bytes por ponto (coil/register) após criar a frota
+  - alocação durante o polling em regime permanente (como update_loop + leitura
+    de um cliente Modbus), com os bancos preenchidos com valores aleatórios:
+      - bytes alocados por ciclo: soma do que o polling de cada servidor cria
+        (listas e ints dos valores lidos), medida com esses resultados ainda
+        vivos; é um mínimo do total, temporários já liberados não entram
+      - pico transitório: maior conjunto vivo durante o polling de um servidor
+      - coletas do GC por segundo
+
+Uso:
+    python bench_memory.py --servers 100 --coils 65536 --registers 65536 --polls 20
+"""
+
+import argparse
+import gc
+import random
+import time
+import tracemalloc
+
+from server_manager import ServerData
+
+
+def poll_server(srv):
+    """
+    Polling de um servidor: sincronização da UI e leitura completa de um cliente.
+    Retorna os objetos criados, para que a medição os encontre vivos.
+    """
+    srv.read_all()
+    # A update_loop percorre os valores: um int por register/coil
+    return [
+        list(srv.registers),
+        list(srv.coils),
+        srv.data_bank.get_holding_registers(0, srv.num_registers),
+        srv.data_bank.get_coils(0, srv.num_coils),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--servers", type=int, default=100)
+    parser.add_argument("--coils", type=int, default=65536)
+    parser.add_argument("--registers", type=int, default=65536)
+    parser.add_argument("--polls", type=int, default=20)
+    parser.add_argument("--base-port", type=int, default=5020)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    gc.collect()
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    servers = [ServerData(args.base_port + i, args.coils, args.registers) for i in range(args.servers)]
+    gc.collect()
+    after, _ = tracemalloc.get_traced_memory()
+
+    points = args.servers * (args.coils + args.registers)
+    fleet_bytes = after - before
+    print(f"Servidores: {args.servers}  coils: {args.coils}  registers: {args.registers}")
+    print(f"Memória da frota: {fleet_bytes / 1024 / 1024:.1f} MiB")
+    print(f"Bytes por ponto: {fleet_bytes / max(points, 1):.3f}")
+    print(f"Bytes de armazenamento (coils+registers): {sum(s.data_bank.nbytes() for s in servers) / max(points, 1):.3f} por ponto")
+
+    # Polling em regime permanente, com valores aleatórios (zeros usariam os ints em cache)
+    rng = random.Random(args.seed)
+    for srv in servers:
+        srv.set_random_values(rng)
+    gen0_before = gc.get_stats()[0]["collections"]
+    allocated = 0
+    transient = 0
+    t0 = time.perf_counter()
+    for _ in range(args.polls):
+        for srv in servers:
+            start, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            produced = poll_server(srv)
+            current, peak = tracemalloc.get_traced_memory()
+            allocated += current - start
+            transient = max(transient, peak - start)
+            del produced
+    elapsed = time.perf_counter() - t0
+    gen0 = gc.get_stats()[0]["collections"] - gen0_before
+    tracemalloc.stop()
+
+    print(f"Polling: {args.polls} ciclos em {elapsed:.2f} s")
+    print(f"Alocação por ciclo (mínimo): {allocated / args.polls / 1024 / 1024:.2f} MiB")
+    print(f"Taxa de alocação (mínimo): {allocated / elapsed / 1024 / 1024:.1f} MiB/s")
+    print(f"Pico transitório: {transient / 1024 / 1024:.2f} MiB")
+    print(f"Coletas do GC (geração 0): {gen0 / elapsed:.1f}/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+# compact_bank.py
+
+from array import array
+
+from pyModbusTCP.server import DataBank
+
+# Espaço de endereços Modbus de discrete inputs e input registers (como no DataBank padrão)
+READ_ONLY_SPACE = 0x10000
+
+
+class BitArray:
+    """
+    Vetor de bits compacto (1 bit por coil) sobre um bytearray.
+    Acesso por índice ou fatia, como uma lista de 0/1.
+    """
+
+    __slots__ = ("_bytes", "_size")
+
+    def __init__(self, size):
+        self._size = size
+        self._bytes = bytearray((size + 7) // 8)
+
+    def __len__(self):
+        return self._size
+
+    def _get(self, i):
+        return (self._bytes[i >> 3] >> (i & 7)) & 1
+
+    def _set(self, i, value):
+        if value:
+            self._bytes[i >> 3] |= 1 << (i & 7)
+        else:
+            self._bytes[i >> 3] &= ~(1 << (i & 7)) & 0xFF
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return [self._get(i) for i in range(*key.indices(self._size))]
+        if key < 0:
+            key += self._size
+        if not 0 <= key < self._size:
+            raise IndexError("BitArray index out of range")
+        return self._get(key)
+
+    def __setitem__(self, key, value):
+        if isinstance(key, slice):
+            indices = range(*key.indices(self._size))
+            values = list(value)
+            if len(values) != len(indices):
+                raise ValueError("BitArray não permite alterar o tamanho")
+            for i, v in zip(indices, values):
+                self._set(i, v)
+            return
+        if key < 0:
+            key += self._size
+        if not 0 <= key < self._size:
+            raise IndexError("BitArray index out of range")
+        self._set(key, value)
+
+    def __iter__(self):
+        return (self._get(i) for i in range(self._size))
+
+    def nbytes(self):
+        return len(self._bytes)
+
+
+class CompactDataBank(DataBank):
+    """
+    DataBank do pyModbusTCP com armazenamento compacto, usado como fonte única
+    do estado do servidor:
+      - coils: BitArray (1 bit por coil)
+      - holding registers: array('H') (2 bytes por register)
+    Apenas os endereços configurados são alocados. Discrete inputs e input
+    registers não são usados pelo simulador: respondem zeros em todo o espaço
+    de endereços, como o DataBank padrão, sem armazenamento por endereço.
+
+    write_listener(type, address, values, source), se definido, é chamado após
+    cada escrita feita por um cliente Modbus (source="client").
+    """
+
+    def __init__(self, num_coils, num_registers):
+        super().__init__(coils_size=0, d_inputs_size=0, h_regs_size=0, i_regs_size=0)
+        self.coils_size = num_coils
+        self.h_regs_size = num_registers
+        self.d_inputs_size = READ_ONLY_SPACE
+        self.i_regs_size = READ_ONLY_SPACE
+        self.coils = BitArray(num_coils)
+        self.registers = array("H", bytes(2 * num_registers))
+        self.write_listener = None
+
+    def get_coils(self, address, number=1, srv_info=None):
+        with self._coils_lock:
+            if (address >= 0) and (address + number <= len(self.coils)):
+                return [bool(b) for b in self.coils[address:address + number]]
+            return None
+
+    def set_coils(self, address, bit_list, srv_info=None):
+        bit_list = [bool(b) for b in bit_list]
+        changes_list = []
+        with self._coils_lock:
+            if (address >= 0) and (address + len(bit_list) <= len(self.coils)):
+                for offset, c_value in enumerate(bit_list):
+                    c_address = address + offset
+                    old = bool(self.coils[c_address])
+                    if old != c_value:
+                        changes_list.append((c_address, old, c_value))
+                        self.coils[c_address] = c_value
+            else:
+                return None
+        if srv_info:
+            for c_address, from_value, to_value in changes_list:
+                self.on_coils_change(c_address, from_value, to_value, srv_info=srv_info)
+            if self.write_listener:
+                self.write_listener("Coil", address, bit_list, "client")
+        return True
+
+    def get_discrete_inputs(self, address, number=1, srv_info=None):
+        if (address >= 0) and (address + number <= READ_ONLY_SPACE):
+            return [False] * number
+        return None
+
+    def get_input_registers(self, address, number=1, srv_info=None):
+        if (address >= 0) and (address + number <= READ_ONLY_SPACE):
+            return [0] * number
+        return None
+
+    def get_holding_registers(self, address, number=1, srv_info=None):
+        with self._h_regs_lock:
+            if (address >= 0) and (address + number <= len(self.registers)):
+                return self.registers[address:address + number].tolist()
+            return None
+
+    def set_holding_registers(self, address, word_list, srv_info=None):
+        word_list = [int(w) & 0xFFFF for w in word_list]
+        with self._h_regs_lock:
+            if (address >= 0) and (address + len(word_list) <= len(self.registers)):
+                end = address + len(word_list)
+                # Só monta a lista de alterações quando há quem a consuma (servidor)
+                if srv_info:
+                    old = self.registers[address:end]
+                    changes_list = [(address + k, o, n) for k, (o, n) in enumerate(zip(old, word_list)) if o != n]
+                self.registers[address:end] = array("H", word_list)
+            else:
+                return None
+        if srv_info:
+            for r_address, from_value, to_value in changes_list:
+                self.on_holding_registers_change(r_address, from_value, to_value, srv_info=srv_info)
+            if self.write_listener:
+                self.write_listener("Register", address, word_list, "client")
+        return True
+
+    def nbytes(self):
+        """Bytes ocupados pelo armazenamento de coils e registers."""
+        return self.coils.nbytes() + self.registers.itemsize * len(self.registers)
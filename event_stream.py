@@ -0,0 +1,313 @@
+# event_stream.py
+"""
+Stream local de eventos de escrita dos servidores simulados.
+
+Cada escrita (cliente Modbus, interface, simulação, aleatório...) vira um evento:
+    {"port", "type", "address", "count", "values", "source", "timestamp"}
+
+Consumidores externos conectam em um socket local (Unix socket ou, onde não
+houver AF_UNIX, TCP em 127.0.0.1) e recebem lotes com prefixo de tamanho:
+    4 bytes (big-endian, tamanho do payload) + JSON {"dropped": n, "events": [...]}
+"dropped" informa quantos eventos foram descartados desde o lote anterior.
+
+Cada assinante tem uma fila limitada em eventos (max_queue) e em valores
+somados dos eventos (max_values: uma escrita em bloco, como um tick aleatório,
+pode carregar milhares de valores); publicar nunca bloqueia o caminho das
+requisições Modbus. Quando um dos limites é atingido, a política define o
+comportamento:
+  - drop_oldest: descarta os eventos mais antigos até o novo caber
+  - drop_newest: descarta o evento novo
+  - disconnect: desconecta o assinante lento
+"""
+
+import collections
+import json
+import os
+import socket
+import stat
+import struct
+import tempfile
+import threading
+import time
+
+POLICIES = ("drop_oldest", "drop_newest", "disconnect")
+
+# Máximo de valores por lote enviado (pelo menos um evento vai em cada lote)
+MAX_BATCH_VALUES = 100000
+
+
+def default_endpoint():
+    """Unix socket no diretório temporário; TCP local onde não houver AF_UNIX (Windows)."""
+    if hasattr(socket, "AF_UNIX"):
+        return os.path.join(tempfile.gettempdir(), "modbustcpsim_events.sock")
+    return "127.0.0.1:5019"
+
+
+def is_tcp_endpoint(endpoint):
+    """'host:porta' = TCP; qualquer outro valor = caminho de Unix socket."""
+    return ":" in endpoint and os.path.sep not in endpoint
+
+
+def make_event(port, type_, address, values, source):
+    return {
+        "port": port,
+        "type": type_,
+        "address": address,
+        "count": len(values),
+        "values": [int(v) for v in values],
+        "source": source,
+        "timestamp": time.time(),
+    }
+
+
+def _event_size(event):
+    """Peso do evento na fila: nº de valores (no mínimo 1)."""
+    return max(1, event["count"])
+
+
+def encode_batch(events, dropped=0):
+    payload = json.dumps({"dropped": dropped, "events": events}, separators=(",", ":")).encode("utf-8")
+    return struct.pack(">I", len(payload)) + payload
+
+
+def _recv_exact(sock, n):
+    buf = b""
+    while len(buf) < n:
+        chunk = sock.recv(n - len(buf))
+        if not chunk:
+            return None
+        buf += chunk
+    return buf
+
+
+def read_batch(sock):
+    """Lê um lote do stream (para consumidores). Retorna o dict ou None se a conexão fechar."""
+    header = _recv_exact(sock, 4)
+    if header is None:
+        return None
+    payload = _recv_exact(sock, struct.unpack(">I", header)[0])
+    if payload is None:
+        return None
+    return json.loads(payload.decode("utf-8"))
+
+
+def connect(endpoint=None):
+    """Conecta ao stream (para consumidores)."""
+    endpoint = endpoint or default_endpoint()
+    if is_tcp_endpoint(endpoint):
+        host, port = endpoint.rsplit(":", 1)
+        return socket.create_connection((host, int(port)))
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.connect(endpoint)
+    return sock
+
+
+class Subscriber:
+    """Assinante: fila limitada + thread que envia os eventos em lotes."""
+
+    def __init__(self, sock, max_queue, max_values, policy, max_batch, flush_interval):
+        self.sock = sock
+        self.max_queue = max_queue
+        self.max_values = max_values
+        self.policy = policy
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.queue = collections.deque()
+        self.queued_values = 0  # soma dos valores dos eventos na fila
+        self.dropped = 0        # descartados desde o último lote
+        self.total_dropped = 0
+        self.closed = False
+        self._cond = threading.Condition()
+        self.thread = threading.Thread(target=self._send_loop, daemon=True)
+
+    def _full(self, size):
+        return len(self.queue) >= self.max_queue or self.queued_values + size > self.max_values
+
+    def offer(self, event):
+        """Enfileira sem bloquear. Retorna False se o assinante foi/está desconectado."""
+        size = _event_size(event)
+        with self._cond:
+            if self.closed:
+                return False
+            if self._full(size):
+                if self.policy == "disconnect":
+                    self._close_locked()
+                    return False
+                if self.policy == "drop_newest" or size > self.max_values:
+                    self.dropped += 1
+                    self.total_dropped += 1
+                    return True
+                while self.queue and self._full(size):
+                    self.queued_values -= _event_size(self.queue.popleft())
+                    self.dropped += 1
+                    self.total_dropped += 1
+            self.queue.append(event)
+            self.queued_values += size
+            self._cond.notify()
+        return True
+
+    def close(self):
+        with self._cond:
+            self._close_locked()
+
+    def _close_locked(self):
+        self.closed = True
+        self._cond.notify()
+        # Desbloqueia um sendall pendente na thread de envio
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    def _send_loop(self):
+        try:
+            while True:
+                with self._cond:
+                    while not self.queue and not self.closed:
+                        self._cond.wait()
+                    if self.closed:
+                        break
+                    # Aguarda um pouco para acumular o lote
+                    deadline = time.monotonic() + self.flush_interval
+                    while len(self.queue) < self.max_batch and not self.closed:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self._cond.wait(remaining)
+                    if self.closed:
+                        break
+                    batch = []
+                    batch_values = 0
+                    while self.queue and len(batch) < self.max_batch:
+                        size = _event_size(self.queue[0])
+                        if batch and batch_values + size > MAX_BATCH_VALUES:
+                            break
+                        batch.append(self.queue.popleft())
+                        batch_values += size
+                    self.queued_values -= batch_values
+                    dropped, self.dropped = self.dropped, 0
+                # Envio fora do lock: um consumidor lento só atrasa a própria thread
+                self.sock.sendall(encode_batch(batch, dropped))
+        except OSError:
+            pass
+        finally:
+            self.closed = True
+            try:
+                self.sock.close()
+            except OSError:
+                pass
+
+
+class EventBroker:
+    """Distribui os eventos publicados para todos os assinantes."""
+
+    def __init__(self, max_queue=10000, max_values=500000, policy="drop_oldest", max_batch=500,
+                 flush_interval=0.05):
+        if policy not in POLICIES:
+            raise ValueError(f"Política inválida: {policy} (use {', '.join(POLICIES)})")
+        self.max_queue = max_queue
+        self.max_values = max_values
+        self.policy = policy
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.subscribers = []
+        self.published = 0
+        self.disconnected = 0
+        self._lock = threading.Lock()
+
+    def publish(self, event):
+        """Publica um evento (não bloqueia: chamado no caminho das requisições Modbus)."""
+        with self._lock:
+            subscribers = self.subscribers
+            self.published += 1
+        lost = [s for s in subscribers if not s.offer(event)]
+        if lost:
+            with self._lock:
+                self.subscribers = [s for s in self.subscribers if s not in lost]
+                self.disconnected += len(lost)
+
+    def subscribe(self, sock):
+        sub = Subscriber(sock, self.max_queue, self.max_values, self.policy, self.max_batch, self.flush_interval)
+        with self._lock:
+            # Lista nova (copy-on-write) para publish iterar sem lock
+            self.subscribers = self.subscribers + [sub]
+        sub.thread.start()
+        return sub
+
+    def close_all(self):
+        with self._lock:
+            subscribers, self.subscribers = self.subscribers, []
+        for sub in subscribers:
+            sub.close()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "subscribers": len(self.subscribers),
+                "published": self.published,
+                "dropped": sum(s.total_dropped for s in self.subscribers),
+                "disconnected": self.disconnected,
+            }
+
+
+class EventStreamServer:
+    """Aceita consumidores no endpoint (caminho de Unix socket ou host:porta) e os inscreve no broker."""
+
+    def __init__(self, broker, endpoint=None):
+        self.broker = broker
+        self.endpoint = endpoint or default_endpoint()
+        self.sock = None
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        if is_tcp_endpoint(self.endpoint):
+            host, port = self.endpoint.rsplit(":", 1)
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            self.sock.bind((host, int(port)))
+        else:
+            self._remove_stale_socket()
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.bind(self.endpoint)
+        self.sock.listen()
+        self.sock.settimeout(0.5)
+        self.running = True
+        self.thread = threading.Thread(target=self._accept_loop, daemon=True)
+        self.thread.start()
+
+    def _accept_loop(self):
+        while self.running:
+            try:
+                conn, _ = self.sock.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            conn.settimeout(None)
+            self.broker.subscribe(conn)
+
+    def stop(self):
+        self.running = False
+        if self.sock:
+            self.sock.close()
+            self.sock = None
+        if self.thread:
+            self.thread.join(timeout=2)
+            self.thread = None
+        self.broker.close_all()
+        if not is_tcp_endpoint(self.endpoint):
+            try:
+                self._remove_stale_socket()
+            except FileExistsError:
+                pass  # o caminho foi substituído por outro arquivo: não é nosso para apagar
+
+    def _remove_stale_socket(self):
+        """Remove um socket antigo no caminho do endpoint; qualquer outro arquivo ali é um erro."""
+        try:
+            mode = os.stat(self.endpoint).st_mode
+        except FileNotFoundError:
+            return
+        if not stat.S_ISSOCK(mode):
+            raise FileExistsError(f"{self.endpoint} existe e não é um socket")
+        os.remove(self.endpoint)
@@ -0,0 +1,131 @@
+# register_types.py
+
+import struct
+
+# Tipo -> (formato struct, nº de registers por valor)
+DATA_TYPES = {
+    "uint16": ("H", 1),
+    "int16": ("h", 1),
+    "uint32": ("I", 2),
+    "int32": ("i", 2),
+    "float32": ("f", 2),
+    "float64": ("d", 4),
+    "string": (None, 1),  # ASCII, 2 caracteres por register
+}
+
+# Ordem -> (inverter words de cada valor, inverter bytes de cada word)
+# ABCD = big-endian (padrão Modbus), CDAB = words trocadas, BADC = bytes trocados, DCBA = little-endian
+ORDERS = {
+    "ABCD": (False, False),
+    "CDAB": (True, False),
+    "BADC": (False, True),
+    "DCBA": (True, True),
+}
+
+DEFAULT_TYPE = "uint16"
+DEFAULT_ORDER = "ABCD"
+
+
+def word_count(data_type, count=1):
+    """Nº de registers ocupados por 'count' valores (para string, count = nº de caracteres)."""
+    if data_type == "string":
+        return (count + 1) // 2
+    return DATA_TYPES[data_type][1] * count
+
+
+def _swap_bytes(raw):
+    b = bytearray(raw)
+    b[0::2], b[1::2] = raw[1::2], raw[0::2]
+    return bytes(b)
+
+
+def _swap_words(words, size):
+    if size <= 1:
+        return list(words)
+    return [w for i in range(0, len(words), size) for w in reversed(words[i:i + size])]
+
+
+def encode(data_type, values, order=DEFAULT_ORDER):
+    """
+    Converte um array de valores (ou uma string ASCII) em registers de 16 bits,
+    com um único struct.pack para o bloco inteiro.
+    Lança ValueError se algum valor não couber no tipo.
+    """
+    swap_words, swap_bytes = ORDERS[order]
+    if data_type == "string":
+        try:
+            raw = values.encode("ascii")
+        except UnicodeEncodeError as e:
+            raise ValueError(f"String não é ASCII: {e}")
+        if len(raw) % 2:
+            raw += b"\0"
+        size = 1
+    else:
+        fmt, size = DATA_TYPES[data_type]
+        try:
+            raw = struct.pack(f">{len(values)}{fmt}", *values)
+        except (struct.error, OverflowError) as e:
+            raise ValueError(f"Valor inválido para {data_type}: {e}")
+    if swap_bytes:
+        raw = _swap_bytes(raw)
+    words = struct.unpack(f">{len(raw) // 2}H", raw)
+    return _swap_words(words, size) if swap_words else list(words)
+
+
+def decode(data_type, words, order=DEFAULT_ORDER):
+    """
+    Converte registers de 16 bits em um array de valores do tipo (ou uma string ASCII).
+    Registers que não completam um valor no final são ignorados.
+    """
+    swap_words, swap_bytes = ORDERS[order]
+    size = DATA_TYPES[data_type][1]
+    words = list(words[:len(words) - len(words) % size])
+    if swap_words:
+        words = _swap_words(words, size)
+    raw = struct.pack(f">{len(words)}H", *words)
+    if swap_bytes:
+        raw = _swap_bytes(raw)
+    if data_type == "string":
+        return raw.decode("ascii", errors="replace").rstrip("\0")
+    fmt = DATA_TYPES[data_type][0]
+    return list(struct.unpack(f">{len(words) // size}{fmt}", raw))
+
+
+def parse_value(data_type, text):
+    """Converte o texto digitado no valor do tipo. Lança ValueError se inválido."""
+    if data_type == "string":
+        return str(text)
+    if data_type.startswith("float"):
+        return float(str(text).replace(",", "."))
+    return int(text)
+
+
+def format_value(data_type, value):
+    """Formata um valor para exibição na tabela/CSV (floats com dígitos suficientes para reler o mesmo valor)."""
+    if data_type == "float32":
+        return f"{value:.9g}"
+    if data_type == "float64":
+        return repr(value)
+    return str(value)
+
+
+def exact_text(data_type, words, order=DEFAULT_ORDER):
+    """
+    Texto de um único valor que, relido com parse_value/encode, volta exatamente
+    às mesmas words. Retorna None se não houver (ex.: NaN com payload, string
+    com bytes não imprimíveis ou nulos); nesse caso as words devem ir brutas.
+    """
+    value = decode(data_type, words, order)
+    if data_type == "string":
+        if not (value.isascii() and value.isprintable()):
+            return None
+        text = value
+    else:
+        text = format_value(data_type, value[0])
+    typed = parse_value(data_type, text)
+    try:
+        if encode(data_type, typed if data_type == "string" else [typed], order) == list(words):
+            return text
+    except ValueError:
+        pass
+    return None
@@ -1,6 +1,9 @@
 # server_manager.py
 
-from pyModbusTCP.server import ModbusServer
+from admission import Admission, LimitedModbusServer
+from compact_bank import CompactDataBank
+from event_stream import make_event
+from register_types import DEFAULT_ORDER, decode, encode, word_count
 
 class ServerData:
     """
@@ -8,74 +11,133 @@ class ServerData:
       - Porta utilizada
       - Número de coils
       - Número de registers
-      - Objeto ModbusServer
-      - Listas (coils e registers) para refletir o estado atual
+      - Objeto ModbusServer (com controle de admissão, ver admission.py)
+      - data_bank compacto (coils e registers), fonte única do estado atual
+      - event_sink opcional (ex.: EventBroker.publish), que recebe um evento
+        por escrita, com a origem ("client", "ui", "simulation", "random"...)
     """
 
-    def __init__(self, port, num_coils, num_registers):
+    __slots__ = ("port", "num_coils", "num_registers", "data_bank", "server_obj", "event_sink")
+
+    def __init__(self, port, num_coils, num_registers, admission=None):
         self.port = port
         self.num_coils = num_coils
         self.num_registers = num_registers
 
+        # Armazenamento compacto, compartilhado com o servidor Modbus
+        self.data_bank = CompactDataBank(num_coils, num_registers)
+        self.data_bank.write_listener = self._publish
+        self.event_sink = None
+
         # Servidor Modbus
-        self.server_obj = ModbusServer(host="127.0.0.1", port=port, no_block=True)
+        self.server_obj = LimitedModbusServer(host="127.0.0.1", port=port, no_block=True,
+                                              data_bank=self.data_bank, admission=admission or Admission())
+
+    @property
+    def admission(self):
+        """Limites e contadores de conexões/requisições (stats() com rejeições e descartes)."""
+        return self.server_obj.admission
 
-        # Armazenamento local
-        self.coils = [0] * num_coils
-        self.registers = [0] * num_registers
+    @property
+    def coils(self):
+        """Coils (BitArray) do data_bank: leitura e escrita diretas, sem cópia."""
+        return self.data_bank.coils
+
+    @property
+    def registers(self):
+        """Holding registers (array('H')) do data_bank: leitura e escrita diretas, sem cópia."""
+        return self.data_bank.registers
 
     def start(self):
-        """Inicia o servidor e configura os valores iniciais."""
+        """Inicia o servidor (os valores iniciais já estão no data_bank)."""
         self.server_obj.start()
-        # Inicializar data_bank do servidor
-        self.server_obj.data_bank.set_coils(0, self.coils)
-        self.server_obj.data_bank.set_holding_registers(0, self.registers)
 
     def stop(self):
         """Para o servidor."""
         self.server_obj.stop()
 
     def read_all(self):
-        """Sincroniza (coils e registers) lendo os valores atuais do data_bank."""
-        coils_data = self.server_obj.data_bank.get_coils(0, self.num_coils) or []
-        if len(coils_data) == self.num_coils:
-            self.coils = coils_data
+        """
+        Mantido por compatibilidade: coils e registers já são o próprio data_bank,
+        então não há cópia a sincronizar.
+        """
 
-        regs_data = self.server_obj.data_bank.get_holding_registers(0, self.num_registers) or []
-        if len(regs_data) == self.num_registers:
-            self.registers = regs_data
+    def _publish(self, type_, address, values, source):
+        """Envia o evento de escrita ao event_sink, se houver."""
+        sink = self.event_sink
+        if sink:
+            sink(make_event(self.port, type_, address, values, source))
 
-    def update_coil(self, index, value):
+    def update_coil(self, index, value, source="local"):
         """Atualiza coil no data_bank."""
         if 0 <= index < self.num_coils:
-            val = 1 if value != 0 else 0
-            self.coils[index] = val
-            self.server_obj.data_bank.set_coils(index, [val])
+            self.set_coils(index, [value], source)
 
-    def update_register(self, index, value):
+    def update_register(self, index, value, source="local"):
         """Atualiza register no data_bank."""
         if 0 <= index < self.num_registers:
-            self.registers[index] = value
-            self.server_obj.data_bank.set_holding_registers(index, [value])
+            self.set_registers(index, [value], source)
+
+    def set_coils(self, index, values, source="local"):
+        """Escreve um bloco contíguo de coils com uma única chamada ao data_bank."""
+        values = [1 if v != 0 else 0 for v in values]
+        if index < 0 or index + len(values) > self.num_coils:
+            return False
+        self.data_bank.set_coils(index, values)
+        self._publish("Coil", index, values, source)
+        return True
+
+    def set_registers(self, index, values, source="local"):
+        """Escreve um bloco contíguo de registers com uma única chamada ao data_bank."""
+        values = [int(v) & 0xFFFF for v in values]
+        if index < 0 or index + len(values) > self.num_registers:
+            return False
+        self.data_bank.set_holding_registers(index, values)
+        self._publish("Register", index, values, source)
+        return True
+
+    def fill_registers(self, index, count, value, source="local"):
+        """Preenche 'count' registers a partir de 'index' com o mesmo valor."""
+        return self.set_registers(index, [value] * count, source)
 
-    def set_all_zero(self):
+    def copy_registers(self, src, dst, count, source="local"):
+        """Copia 'count' registers de 'src' para 'dst' (a partir do data_bank atual)."""
+        if src < 0 or src + count > self.num_registers:
+            return False
+        return self.set_registers(dst, self.registers[src:src + count], source)
+
+    def write_typed(self, index, data_type, values, order=DEFAULT_ORDER, source="local"):
+        """
+        Codifica um array de valores (ou uma string ASCII) do tipo informado
+        (ver register_types) e escreve o bloco a partir de 'index'.
+        Lança ValueError se algum valor não couber no tipo.
+        """
+        return self.set_registers(index, encode(data_type, values, order), source)
+
+    def read_typed(self, index, data_type, count=1, order=DEFAULT_ORDER):
+        """
+        Decodifica 'count' valores do tipo informado a partir de 'index'
+        (para string, count = nº de caracteres).
+        """
+        n = word_count(data_type, count)
+        if index < 0 or index + n > self.num_registers:
+            return None
+        return decode(data_type, self.registers[index:index + n], order)
+
+    def set_all_zero(self, source="local"):
         """Zera todos os coils e registers."""
-        self.coils = [0] * self.num_coils
-        self.registers = [0] * self.num_registers
-        self.server_obj.data_bank.set_coils(0, self.coils)
-        self.server_obj.data_bank.set_holding_registers(0, self.registers)
+        self.set_coils(0, [0] * self.num_coils, source)
+        self.set_registers(0, [0] * self.num_registers, source)
 
-    def set_random_values(self):
+    def set_random_values(self, rng=None):
         """
         Define valores aleatórios para todos os coils e registers:
         - Coils: 0 ou 1
         - Registers: 0..65535
+        Um random.Random semeado pode ser passado em 'rng' para gerar
+        sequências reprodutíveis.
         """
         import random
-        for i in range(self.num_coils):
-            val = random.randint(0, 1)
-            self.update_coil(i, val)
-
-        for i in range(self.num_registers):
-            val = random.randint(0, 65535)
-            self.update_register(i, val)
+        rng = rng or random
+        self.set_coils(0, [rng.randint(0, 1) for _ in range(self.num_coils)], "random")
+        self.set_registers(0, [rng.randint(0, 65535) for _ in range(self.num_registers)], "random")
@@ -0,0 +1,213 @@
+# simulation.py
+
+import csv
+import random
+import time
+
+from register_types import DEFAULT_TYPE, DEFAULT_ORDER, encode, parse_value, word_count
+
+
+class WallClock:
+    """Relógio de parede: a simulação corre em tempo real."""
+
+    virtual = False
+    instant = False
+    speed = 1.0
+
+    def now_ms(self):
+        return time.monotonic() * 1000
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+    def wait_until(self, target_ms, keep_running):
+        """
+        Aguarda até o instante target_ms (em fatias de 20 ms, para permitir parada).
+        Retorna False se keep_running() deixar de ser verdadeiro antes disso.
+        """
+        while keep_running():
+            remaining = target_ms - self.now_ms()
+            if remaining <= 0:
+                return True
+            self.sleep(min(remaining, 20) / 1000.0)
+        return False
+
+
+class VirtualClock(WallClock):
+    """
+    Relógio virtual:
+      - speed > 0: o tempo corre 'speed' vezes mais rápido que o real
+      - speed == 0: salto direto, o tempo só avança quando o agendador
+        pula para o instante do próximo evento
+    """
+
+    virtual = True
+
+    def __init__(self, speed=0.0):
+        self.speed = max(0.0, speed)
+        self.instant = self.speed == 0
+        self._base_ms = 0.0
+        self._real_ref = time.monotonic()
+
+    def now_ms(self):
+        if self.instant:
+            return self._base_ms
+        return self._base_ms + (time.monotonic() - self._real_ref) * 1000 * self.speed
+
+    def sleep(self, seconds):
+        if self.instant:
+            self._base_ms += seconds * 1000
+        else:
+            time.sleep(seconds / self.speed)
+
+    def wait_until(self, target_ms, keep_running):
+        if not self.instant:
+            return super().wait_until(target_ms, keep_running)
+        if not keep_running():
+            return False
+        self._base_ms = max(self._base_ms, target_ms)
+        return True
+
+
+def make_clock(speed):
+    """Velocidade 1 = tempo real; outro valor = relógio virtual (0 = salto direto)."""
+    if speed == 1:
+        return WallClock()
+    return VirtualClock(speed)
+
+
+def condition_satisfied(cond, srv):
+    """Avalia a condição de início ({port, type, address, operator, value}) no servidor."""
+    if not cond:
+        return True
+    if not srv:
+        return False
+    srv.read_all()
+    if cond["type"] == "Coil":
+        val = srv.coils[cond["address"]]
+    else:
+        val = srv.registers[cond["address"]]
+
+    if cond["operator"] == "=":
+        return val == cond["value"]
+    elif cond["operator"] == ">":
+        return val > cond["value"]
+    elif cond["operator"] == "<":
+        return val < cond["value"]
+    return False
+
+
+def _to_int(value, default=0):
+    try:
+        return int(value)
+    except ValueError:
+        return default
+
+
+def parse_point_value(type_, data_type, text):
+    """
+    Converte o valor de um ponto de simulação conforme o tipo/formato.
+    Lança ValueError se o valor não puder ser escrito no formato (ex.: fora da faixa).
+    """
+    if type_ == "Coil" or not data_type or data_type == DEFAULT_TYPE:
+        return _to_int(text)
+    value = parse_value(data_type, text)
+    # Codifica já aqui para não falhar só na thread da simulação
+    encode(data_type, value if data_type == "string" else [value])
+    return value
+
+
+def point_fits(srv, type_, address, data_type, value):
+    """Verifica se o ponto (possivelmente de várias words) cabe no servidor a partir de address."""
+    if type_ == "Coil":
+        return 0 <= address < srv.num_coils
+    n = word_count(data_type or DEFAULT_TYPE, len(value) if data_type == "string" else 1)
+    return 0 <= address and address + n <= srv.num_registers
+
+
+def read_scenario_csv(fp):
+    """
+    Lê um CSV de simulação (Port;Type;Address;Value;Time_ms[;DataType;Order])
+    e retorna a lista de pontos, na ordem do arquivo.
+    """
+    points = []
+    with open(fp, "r", encoding="utf-8") as f:
+        for row in csv.DictReader(f, delimiter=";"):
+            t = row["Type"]
+            dt = (row.get("DataType") or DEFAULT_TYPE) if t == "Register" else ""
+            points.append({
+                "port": _to_int(row["Port"]),
+                "type": t,
+                "address": _to_int(row["Address"]),
+                "value": parse_point_value(t, dt, row["Value"]),
+                "time_ms": _to_int(row["Time_ms"]),
+                "data_type": dt,
+                "order": (row.get("Order") or DEFAULT_ORDER) if t == "Register" else "",
+            })
+    return points
+
+
+def apply_event(srv, d):
+    """Aplica um ponto de simulação no servidor (registers podem ter formato, ver register_types)."""
+    data_type = d.get("data_type") or DEFAULT_TYPE
+    if d["type"] == "Coil":
+        srv.update_coil(d["address"], d["value"], "simulation")
+    elif data_type == DEFAULT_TYPE:
+        srv.update_register(d["address"], d["value"], "simulation")
+    else:
+        value = d["value"] if data_type == "string" else [d["value"]]
+        srv.write_typed(d["address"], data_type, value, d.get("order") or DEFAULT_ORDER, "simulation")
+
+
+def run_scenario(servers, events, clock, condition=None, random_interval_ms=0,
+                 rng=None, keep_running=lambda: True):
+    """
+    Executa uma simulação contra o relógio informado, sem depender da interface.
+
+      - servers: dict porta -> ServerData
+      - events: lista de dicts (port, type, address, value, time_ms[, data_type, order])
+      - condition: condição de início (ou None para início imediato)
+      - random_interval_ms: se > 0, a geração aleatória é agendada na mesma
+        linha do tempo dos eventos (usada com o relógio virtual)
+      - rng: random.Random semeado, para trajetórias reprodutíveis
+
+    Retorna True se todos os eventos foram aplicados.
+    """
+    rng = rng or random.Random()
+    next_random = clock.now_ms() + random_interval_ms if random_interval_ms > 0 else None
+
+    def random_tick():
+        for srv in servers.values():
+            srv.set_random_values(rng)
+
+    # 1) Se houver condição, aguardar até ser satisfeita
+    if condition:
+        while not condition_satisfied(condition, servers.get(condition["port"])):
+            if not keep_running():
+                return False
+            if next_random is not None:
+                if not clock.wait_until(next_random, keep_running):
+                    return False
+                random_tick()
+                next_random += random_interval_ms
+            elif clock.instant:
+                # Sem eventos agendados, só clientes externos podem alterar o valor
+                time.sleep(0.1)
+            else:
+                clock.sleep(0.1)
+
+    # 2) Executar os eventos (ordenação estável: empates mantêm a ordem da tabela)
+    start_ms = clock.now_ms()
+    for d in sorted(events, key=lambda x: x["time_ms"]):
+        target_ms = start_ms + d["time_ms"]
+        while next_random is not None and next_random <= target_ms:
+            if not clock.wait_until(next_random, keep_running):
+                return False
+            random_tick()
+            next_random += random_interval_ms
+        if not clock.wait_until(target_ms, keep_running):
+            return False
+        srv = servers.get(d["port"])
+        if srv:
+            apply_event(srv, d)
+    return True
@@ -0,0 +1,457 @@
+# soak_test.py
+"""
+Teste de longa duração (soak).
+
+Em ciclos, durante --duration segundos:
+  - inicia uma frota de servidores, com clientes Modbus lendo continuamente
+  - liga/desliga a geração aleatória
+  - importa (--scenario CSV) ou gera um cenário e o executa no relógio virtual
+  - para a frota
+
+Com --ui, os ciclos passam pela interface: uma ModbusApp oculta (precisa de um
+display; em servidores use Xvfb) é iniciada/parada com start_servers/stop_servers,
+e as amostras incluem o nº de itens das Treeviews e de threads update_loop.
+
+A cada --sample-interval segundos registra RSS, nº de threads, sockets abertos
+e latência das leituras (p50/p95). Após o aquecimento (--warmup), compara cada
+amostra com a primeira e falha (código de saída 1) se algum crescimento passar
+dos limites configurados, mostrando os maiores alocadores (tracemalloc).
+
+Uso:
+    python soak_test.py --duration 7200 --servers 10
+    xvfb-run python soak_test.py --ui --duration 3600
+"""
+
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+import tracemalloc
+import types
+
+from pyModbusTCP.client import ModbusClient
+
+from event_stream import EventBroker
+from server_manager import ServerData
+from simulation import VirtualClock, point_fits, read_scenario_csv, run_scenario
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+# ------------------------------------------------------
+#                     Métricas
+# ------------------------------------------------------
+def rss_bytes():
+    """RSS do processo (psutil ou /proc); None se indisponível."""
+    if psutil:
+        return psutil.Process().memory_info().rss
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def open_sockets():
+    """Nº de sockets abertos pelo processo (psutil ou /proc); None se indisponível."""
+    if psutil:
+        return len(psutil.Process().connections(kind="all"))
+    try:
+        fds = os.listdir("/proc/self/fd")
+    except OSError:
+        return None
+    count = 0
+    for fd in fds:
+        try:
+            if os.readlink(f"/proc/self/fd/{fd}").startswith("socket:"):
+                count += 1
+        except OSError:
+            pass
+    return count
+
+
+def percentile(values, p):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+# ------------------------------------------------------
+#                  Carga de clientes
+# ------------------------------------------------------
+class ClientLoad:
+    """Threads de clientes Modbus lendo os servidores e medindo a latência."""
+
+    def __init__(self, ports, num_clients, count):
+        self.ports = ports
+        self.count = count
+        self.running = False
+        self.errors = 0
+        self._latencies = []
+        self._lock = threading.Lock()
+        self.threads = [threading.Thread(target=self._loop, daemon=True) for _ in range(num_clients)]
+
+    def start(self):
+        self.running = True
+        for t in self.threads:
+            t.start()
+
+    def stop(self):
+        self.running = False
+        for t in self.threads:
+            t.join(timeout=5)
+
+    def take_latencies(self):
+        """Retorna (e zera) as latências em ms coletadas desde a última chamada."""
+        with self._lock:
+            lat, self._latencies = self._latencies, []
+        return lat
+
+    def _loop(self):
+        clients = [ModbusClient(host="127.0.0.1", port=p, auto_open=True, timeout=1.0) for p in self.ports]
+        while self.running:
+            for c in clients:
+                t0 = time.perf_counter()
+                regs = c.read_holding_registers(0, self.count)
+                if regs is None:
+                    self.errors += 1
+                    time.sleep(0.01)
+                    continue
+                with self._lock:
+                    self._latencies.append((time.perf_counter() - t0) * 1000)
+        for c in clients:
+            c.close()
+
+
+# ------------------------------------------------------
+#                      Cenário
+# ------------------------------------------------------
+def synthetic_scenario(rng, ports, num_coils, num_registers, points=200, span_ms=60000):
+    """Cenário aleatório (mas reprodutível pela semente) de 'points' pontos em 'span_ms'."""
+    events = []
+    for _ in range(points):
+        is_coil = num_coils and (not num_registers or rng.random() < 0.5)
+        events.append({
+            "port": rng.choice(ports),
+            "type": "Coil" if is_coil else "Register",
+            "address": rng.randrange(num_coils if is_coil else num_registers),
+            "value": rng.randint(0, 1) if is_coil else rng.randint(0, 65535),
+            "time_ms": rng.randrange(span_ms),
+        })
+    return events
+
+
+def fit_scenario(events, ports, num_coils, num_registers):
+    """
+    Adapta um cenário importado à frota do teste: as portas do CSV são mapeadas,
+    na ordem em que aparecem, para as portas da frota, e pontos que não cabem
+    nos servidores (ver point_fits) são descartados.
+    Retorna (eventos adaptados, nº de descartados).
+    """
+    shape = types.SimpleNamespace(num_coils=num_coils, num_registers=num_registers)
+    port_map = {}
+    fitted = []
+    for d in events:
+        port = port_map.setdefault(d["port"], ports[len(port_map) % len(ports)])
+        if point_fits(shape, d["type"], d["address"], d["data_type"], d["value"]):
+            fitted.append(dict(d, port=port))
+    return fitted, len(events) - len(fitted)
+
+
+# ------------------------------------------------------
+#                      Ciclos
+# ------------------------------------------------------
+def run_cycle(args, ports, rng, broker, scenario):
+    servers = []
+    try:
+        for port in ports:
+            srv = ServerData(port, args.coils, args.registers)
+            srv.event_sink = broker.publish
+            srv.start()
+            servers.append(srv)
+
+        # Geração aleatória ligada por um tempo, sob carga dos clientes
+        random_active = [True]
+
+        def random_loop():
+            while random_active[0]:
+                for srv in servers:
+                    srv.set_random_values(rng)
+                time.sleep(args.random_interval_ms / 1000.0)
+
+        t = threading.Thread(target=random_loop, daemon=True)
+        t.start()
+        time.sleep(args.random_on_ms / 1000.0)
+        random_active[0] = False
+        t.join()
+        for srv in servers:
+            srv.set_all_zero("random")
+
+        # Cenário no relógio virtual (salto direto)
+        events = scenario or synthetic_scenario(rng, ports, args.coils, args.registers)
+        run_scenario({s.port: s for s in servers}, events, VirtualClock(0),
+                     random_interval_ms=args.scenario_random_ms, rng=rng)
+
+        time.sleep(args.hold_ms / 1000.0)
+    finally:
+        for srv in servers:
+            srv.stop()
+
+
+def ui_probe(app):
+    """Itens em todas as Treeviews da ModbusApp e threads update_loop vivas."""
+    from tkinter import ttk
+
+    items = 0
+    widgets = [app]
+    while widgets:
+        w = widgets.pop()
+        widgets.extend(w.winfo_children())
+        if isinstance(w, ttk.Treeview):
+            items += len(w.get_children())
+    update_threads = sum(1 for t in threading.enumerate() if t.name == "update_loop")
+    return {"tree_items": items, "update_threads": update_threads}
+
+
+def ui_cycles(app, args, monitor):
+    """
+    Ciclos pela interface. Gerador executado no mainloop da app (as threads da
+    ModbusApp acessam o Tk e precisam dele rodando): cada yield é a pausa em ms.
+    """
+    while not monitor.done():
+        app.start_servers()
+        if not app.servers_list:
+            monitor.failures.append("Interface: nenhum servidor iniciado")
+            return
+        app.toggle_random()
+        yield args.random_on_ms
+        app.toggle_random()
+        yield args.hold_ms
+        probe = ui_probe(app)
+        app.stop_servers()
+        yield args.ui_restart_ms
+        monitor.cycle_done(probe)
+
+
+def run_ui(args, monitor):
+    """Executa os ciclos na ModbusApp oculta. Retorna False se o Tk não puder iniciar."""
+    import tkinter as tk
+    import ui_manager
+
+    # Diálogos bloqueariam o teste: erros viram falhas, avisos são ignorados
+    ui_manager.messagebox.showerror = lambda title, msg, **kw: monitor.failures.append(f"Interface: {msg}")
+    ui_manager.messagebox.showinfo = lambda title, msg, **kw: None
+    try:
+        app = ui_manager.ModbusApp()
+    except tk.TclError as e:
+        print(f"Não foi possível iniciar o Tk ({e}). Defina DISPLAY ou use xvfb-run.")
+        return False
+    app.withdraw()
+    app.base_port.set(args.base_port)
+    app.num_servers.set(args.servers)
+    app.num_coils.set(args.coils)
+    app.num_registers.set(args.registers)
+    app.random_interval_ms.set(args.random_interval_ms)
+    app.random_seed.set(str(args.seed))
+
+    cycles = ui_cycles(app, args, monitor)
+
+    def step():
+        try:
+            delay = next(cycles)
+        except StopIteration:
+            app.quit()
+            return
+        except Exception as e:
+            monitor.failures.append(f"Ciclo {monitor.cycles + 1} falhou: {e!r}")
+            app.quit()
+            return
+        app.after(delay, step)
+
+    app.after(0, step)
+    app.mainloop()
+    if app.running:
+        app.stop_servers()
+    app.destroy()
+    return True
+
+
+# ------------------------------------------------------
+#                   Verificação
+# ------------------------------------------------------
+def check_growth(args, baseline, sample):
+    """Retorna a lista de limites ultrapassados (vazia se tudo ok)."""
+    failures = []
+    if baseline["rss"] is not None and sample["rss"] is not None:
+        growth_mb = (sample["rss"] - baseline["rss"]) / 1024 / 1024
+        if growth_mb > args.max_rss_growth_mb:
+            failures.append(f"RSS cresceu {growth_mb:.1f} MiB (limite {args.max_rss_growth_mb})")
+    if sample["threads"] - baseline["threads"] > args.max_thread_growth:
+        failures.append(f"Threads: {baseline['threads']} -> {sample['threads']} (limite +{args.max_thread_growth})")
+    if baseline["sockets"] is not None and sample["sockets"] is not None:
+        if sample["sockets"] - baseline["sockets"] > args.max_socket_growth:
+            failures.append(f"Sockets: {baseline['sockets']} -> {sample['sockets']} (limite +{args.max_socket_growth})")
+    if baseline["p95"] and sample["p95"]:
+        ratio = sample["p95"] / baseline["p95"]
+        if ratio > args.max_latency_growth:
+            failures.append(f"Latência p95: {baseline['p95']:.2f} -> {sample['p95']:.2f} ms "
+                            f"({ratio:.1f}x, limite {args.max_latency_growth}x)")
+    if "tree_items" in sample:
+        if sample["tree_items"] - baseline["tree_items"] > args.max_tree_growth:
+            failures.append(f"Itens das Treeviews: {baseline['tree_items']} -> {sample['tree_items']} "
+                            f"(limite +{args.max_tree_growth})")
+        if sample["update_threads"] > args.max_update_threads:
+            failures.append(f"Threads update_loop: {sample['update_threads']} (limite {args.max_update_threads})")
+    return failures
+
+
+def print_sample(sample):
+    rss = f"{sample['rss'] / 1024 / 1024:.1f} MiB" if sample["rss"] is not None else "n/d"
+    p50 = f"{sample['p50']:.2f}" if sample["p50"] is not None else "n/d"
+    p95 = f"{sample['p95']:.2f}" if sample["p95"] is not None else "n/d"
+    ui = ""
+    if "tree_items" in sample:
+        ui = f" itens={sample['tree_items']} update_loop={sample['update_threads']}"
+    print(f"[{sample['elapsed']:8.0f} s] ciclos={sample['cycles']} rss={rss} threads={sample['threads']} "
+          f"sockets={sample['sockets']} lat p50/p95={p50}/{p95} ms erros={sample['errors']}{ui}", flush=True)
+
+
+def print_top_allocators(baseline_snapshot, limit=10):
+    if baseline_snapshot is None:
+        return
+    print(f"Maiores crescimentos de alocação (tracemalloc, top {limit}):")
+    for stat in tracemalloc.take_snapshot().compare_to(baseline_snapshot, "lineno")[:limit]:
+        print(f"  {stat}")
+
+
+class Monitor:
+    """Amostragem após cada ciclo e comparação com a amostra base."""
+
+    def __init__(self, args, load):
+        self.args = args
+        self.load = load
+        self.start = time.monotonic()
+        self.next_sample = self.start + args.warmup
+        self.baseline = None
+        self.baseline_snapshot = None
+        self.cycles = 0
+        self.failures = []
+
+    def done(self):
+        return bool(self.failures) or time.monotonic() - self.start >= self.args.duration
+
+    def cycle_done(self, probe=None):
+        """Conta um ciclo e, se for a hora, amostra (probe: métricas extras, ex.: ui_probe)."""
+        self.cycles += 1
+        if time.monotonic() < self.next_sample:
+            return
+        self.next_sample = time.monotonic() + self.args.sample_interval
+
+        lat = self.load.take_latencies()
+        sample = {
+            "elapsed": time.monotonic() - self.start,
+            "cycles": self.cycles,
+            "rss": rss_bytes(),
+            "threads": threading.active_count(),
+            "sockets": open_sockets(),
+            "p50": percentile(lat, 0.50),
+            "p95": percentile(lat, 0.95),
+            "errors": self.load.errors,
+        }
+        sample.update(probe or {})
+        print_sample(sample)
+        if self.baseline is None:
+            self.baseline = sample
+            if tracemalloc.is_tracing():
+                self.baseline_snapshot = tracemalloc.take_snapshot()
+            return
+        self.failures.extend(check_growth(self.args, self.baseline, sample))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=float, default=600, help="duração total (s)")
+    parser.add_argument("--warmup", type=float, default=30, help="aquecimento antes da amostra base (s)")
+    parser.add_argument("--sample-interval", type=float, default=10, help="intervalo entre amostras (s)")
+    parser.add_argument("--servers", type=int, default=5)
+    parser.add_argument("--coils", type=int, default=100)
+    parser.add_argument("--registers", type=int, default=100)
+    parser.add_argument("--base-port", type=int, default=15020)
+    parser.add_argument("--clients", type=int, default=2, help="threads de clientes Modbus")
+    parser.add_argument("--scenario", help="CSV de simulação a importar (padrão: cenário gerado)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--random-interval-ms", type=int, default=50)
+    parser.add_argument("--random-on-ms", type=int, default=500, help="tempo com aleatório ligado por ciclo")
+    parser.add_argument("--scenario-random-ms", type=int, default=1000,
+                        help="intervalo do aleatório agendado no cenário virtual (0 = desligado)")
+    parser.add_argument("--hold-ms", type=int, default=500, help="tempo com a frota parada em carga por ciclo")
+    parser.add_argument("--ui", action="store_true", help="ciclos pela ModbusApp (oculta; requer display)")
+    parser.add_argument("--ui-restart-ms", type=int, default=100, help="pausa entre parar e reiniciar na interface")
+    parser.add_argument("--max-rss-growth-mb", type=float, default=50)
+    parser.add_argument("--max-thread-growth", type=int, default=5)
+    parser.add_argument("--max-socket-growth", type=int, default=10)
+    parser.add_argument("--max-latency-growth", type=float, default=3.0, help="razão máxima do p95 sobre a base")
+    parser.add_argument("--max-tree-growth", type=int, default=0, help="crescimento máximo dos itens das Treeviews (--ui)")
+    parser.add_argument("--max-update-threads", type=int, default=1, help="máximo de threads update_loop vivas (--ui)")
+    parser.add_argument("--no-tracemalloc", action="store_true")
+    args = parser.parse_args()
+
+    ports = [args.base_port + i for i in range(args.servers)]
+    rng = random.Random(args.seed)
+    broker = EventBroker()
+    scenario = None
+    if args.scenario:
+        try:
+            scenario, skipped = fit_scenario(read_scenario_csv(args.scenario), ports, args.coils, args.registers)
+        except (OSError, KeyError, ValueError) as e:
+            print(f"FALHA: cenário {args.scenario} inválido: {e}")
+            return 1
+        if skipped:
+            print(f"Cenário: {skipped} ponto(s) não cabem na frota e foram descartados.")
+
+    if not args.no_tracemalloc:
+        tracemalloc.start()
+
+    load = ClientLoad(ports, args.clients, max(1, min(args.registers, 125)))
+    load.start()
+    monitor = Monitor(args, load)
+    try:
+        if args.ui:
+            if not run_ui(args, monitor):
+                return 2
+        else:
+            while not monitor.done():
+                try:
+                    run_cycle(args, ports, rng, broker, scenario)
+                except Exception as e:
+                    monitor.failures.append(f"Ciclo {monitor.cycles + 1} falhou: {e!r}")
+                    break
+                monitor.cycle_done()
+    finally:
+        load.stop()
+
+    if monitor.failures:
+        print("FALHA:")
+        for f in monitor.failures:
+            print(f"  - {f}")
+        print_top_allocators(monitor.baseline_snapshot)
+        return 1
+    if monitor.baseline is None:
+        print("Duração menor que o aquecimento: nenhuma amostra comparada.")
+    else:
+        print(f"OK: {monitor.cycles} ciclos sem crescimento acima dos limites.")
+        print_top_allocators(monitor.baseline_snapshot)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,8 +5,15 @@ from tkinter import ttk, filedialog, messagebox
 import csv
 import threading
 import time
+import random
 
 from server_manager import ServerData
+from admission import Admission
+from register_types import (DATA_TYPES, ORDERS, DEFAULT_TYPE, DEFAULT_ORDER,
+                            decode, encode, word_count, parse_value, format_value, exact_text)
+from event_stream import EventBroker, EventStreamServer, default_endpoint
+from simulation import (WallClock, make_clock, run_scenario,
+                        parse_point_value, point_fits, read_scenario_csv)
 
 def safe_get_int(value, default=0):
     """Converte string em inteiro, se não for possível, retorna default."""
@@ -15,11 +22,21 @@ def safe_get_int(value, default=0):
     except ValueError:
         return default
 
+def safe_get_float(value, default=0.0):
+    """Converte string em float (aceita vírgula), se não for possível, retorna default."""
+    try:
+        return float(str(value).replace(",", "."))
+    except ValueError:
+        return default
+
 class ModbusApp(tk.Tk):
     def __init__(self):
         super().__init__()
         self.title("Simulador de Servidores Modbus")
-        self.iconbitmap("Resources/icon.ico")
+        try:
+            self.iconbitmap("Resources/icon.ico")
+        except tk.TclError:
+            pass  # ícone .ico só é suportado no Windows
         self.geometry("900x600")
 
         # Variáveis de configuração
@@ -30,6 +47,8 @@ class ModbusApp(tk.Tk):
 
         # Lista de servidores
         self.servers_list = []
+        # Formato de exibição dos registers por porta: {"data_type", "order"}
+        self.server_formats = {}
         self.running = False
 
         # Thread de atualização
@@ -39,12 +58,20 @@ class ModbusApp(tk.Tk):
         self.random_interval_ms = tk.IntVar(value=1000)
         self.random_active = False
         self.random_thread = None
+        self.random_seed = tk.StringVar(value="")  # vazio = não determinístico
+        self.random_rng = random.Random()
+        # Serializa os ticks do aleatório com a passagem dele para a simulação virtual
+        self.random_lock = threading.Lock()
 
         # ------ Simulação ------
         self.sim_tab_id = None     # Frame da aba "Simulação"
         self.sim_data = []         # Itens de simulação
         self.sim_thread = None
         self.sim_running = False
+        self.sim_speed = tk.StringVar(value="1")  # 1 = tempo real, N = N× mais rápido, 0 = salto direto
+        self.sim_clock = WallClock()
+        self.sim_random_interval = 0
+        self.sim_rng = random.Random()
 
         # ------ Condição ------
         self.sim_condition = None  # dict ou None
@@ -53,6 +80,21 @@ class ModbusApp(tk.Tk):
         self.label_frame = None
         self.condition_label = None
 
+        # ------ Stream de eventos de escrita ------
+        self.event_stream_enabled = tk.BooleanVar(value=False)
+        self.event_endpoint = tk.StringVar(value=default_endpoint())
+        self.event_broker = EventBroker()
+        self.event_server = None
+
+        # ------ Controle de admissão (0 = ilimitado) ------
+        self.max_conn_server = tk.IntVar(value=0)
+        self.max_conn_total = tk.IntVar(value=0)
+        self.max_inflight_server = tk.IntVar(value=0)
+        self.max_inflight_total = tk.IntVar(value=0)
+        self.idle_timeout_s = tk.IntVar(value=0)
+        self.global_admission = Admission()
+        self.admission_label = None
+
         self._create_widgets()
 
     def _create_widgets(self):
@@ -96,11 +138,36 @@ class ModbusApp(tk.Tk):
         self.btn_random.pack(side="left", padx=5)
         self.btn_random.configure(state="disabled")
 
+        ttk.Label(random_frame, text="Semente:").pack(side="left", padx=5)
+        tk.Entry(random_frame, textvariable=self.random_seed, width=8).pack(side="left", padx=5)
+
         # Simular
         self.btn_simular = ttk.Button(config_frame, text="Simular", command=self.create_sim_tab)
         self.btn_simular.grid(row=2, column=5, padx=5, pady=5)
         self.btn_simular.configure(state="disabled")
 
+        # Stream de eventos de escrita (para consumidores externos)
+        events_frame = ttk.Frame(config_frame)
+        events_frame.grid(row=3, column=0, columnspan=10, pady=2, sticky="w")
+        ttk.Checkbutton(events_frame, text="Stream de eventos:", variable=self.event_stream_enabled).pack(side="left", padx=5)
+        tk.Entry(events_frame, textvariable=self.event_endpoint, width=40).pack(side="left", padx=5)
+
+        # Controle de admissão
+        limits_frame = ttk.Frame(config_frame)
+        limits_frame.grid(row=4, column=0, columnspan=10, pady=2, sticky="w")
+        ttk.Label(limits_frame, text="Limites (0 = ilimitado) - Conexões/servidor:").pack(side="left", padx=5)
+        tk.Entry(limits_frame, textvariable=self.max_conn_server, width=5).pack(side="left")
+        ttk.Label(limits_frame, text="Conexões total:").pack(side="left", padx=5)
+        tk.Entry(limits_frame, textvariable=self.max_conn_total, width=5).pack(side="left")
+        ttk.Label(limits_frame, text="Requisições/servidor:").pack(side="left", padx=5)
+        tk.Entry(limits_frame, textvariable=self.max_inflight_server, width=5).pack(side="left")
+        ttk.Label(limits_frame, text="Requisições total:").pack(side="left", padx=5)
+        tk.Entry(limits_frame, textvariable=self.max_inflight_total, width=5).pack(side="left")
+        ttk.Label(limits_frame, text="Timeout ocioso (s):").pack(side="left", padx=5)
+        tk.Entry(limits_frame, textvariable=self.idle_timeout_s, width=5).pack(side="left")
+        self.admission_label = tk.Label(config_frame, text="", fg="blue")
+        self.admission_label.grid(row=5, column=0, columnspan=10, sticky="w", padx=5)
+
         # Notebook principal
         self.notebook = ttk.Notebook(self)
         self.notebook.pack(fill="both", expand=True, padx=5, pady=5)
@@ -121,9 +188,10 @@ class ModbusApp(tk.Tk):
         r = self.num_registers.get()
 
         self.servers_list = []
+        self._reset_admission()
         for i in range(n_srv):
             port = base_port + i
-            srv = ServerData(port, c, r)
+            srv = ServerData(port, c, r, self._server_admission())
             try:
                 srv.start()
             except Exception as e:
@@ -139,9 +207,10 @@ class ModbusApp(tk.Tk):
             self.interval_entry.configure(state="normal")
             # Habilitar Simular
             self.btn_simular.configure(state="normal")
+            self._start_event_stream()
 
             # Thread de atualização
-            self.update_thread = threading.Thread(target=self.update_loop, daemon=True)
+            self.update_thread = threading.Thread(target=self.update_loop, name="update_loop", daemon=True)
             self.update_thread.start()
 
     def stop_servers(self):
@@ -157,6 +226,8 @@ class ModbusApp(tk.Tk):
         for srv in self.servers_list:
             srv.stop()
         self.servers_list.clear()
+        self._stop_event_stream()
+        self.server_formats.clear()
 
         # Remove todas as abas
         for tab_id in self.notebook.tabs():
@@ -171,11 +242,70 @@ class ModbusApp(tk.Tk):
         self.interval_entry.configure(state="disabled")
         self.btn_simular.configure(state="disabled")
 
+    def _reset_admission(self):
+        """Cria a admissão global da frota com os limites configurados."""
+        self.global_admission = Admission(max_connections=self.max_conn_total.get(),
+                                          max_inflight=self.max_inflight_total.get(),
+                                          idle_timeout=self.idle_timeout_s.get())
+
+    def _server_admission(self):
+        """Admissão de um servidor, encadeada à global."""
+        return Admission(max_connections=self.max_conn_server.get(),
+                         max_inflight=self.max_inflight_server.get(),
+                         parent=self.global_admission)
+
+    def _admission_text(self):
+        """Resumo de conexões e rejeições de todos os servidores."""
+        totals = {"connections": 0, "rejected": 0, "shed": 0, "idle_closed": 0}
+        for srv in self.servers_list:
+            st = srv.admission.stats()
+            for k in totals:
+                totals[k] += st[k]
+        return (f"Conexões: {totals['connections']} | Conexões recusadas: {totals['rejected']} | "
+                f"Requisições recusadas (ocupado): {totals['shed']} | Fechadas por inatividade: {totals['idle_closed']}")
+
+    def _start_event_stream(self):
+        """
+        Abre o endpoint do stream de eventos, se habilitado. Os servidores só
+        publicam eventos enquanto o stream está aberto.
+        """
+        if not self.event_stream_enabled.get() or self.event_server:
+            return
+        server = EventStreamServer(self.event_broker, self.event_endpoint.get().strip() or None)
+        try:
+            server.start()
+        except OSError as e:
+            messagebox.showerror("Erro", f"Não foi possível abrir o stream de eventos em {server.endpoint}: {e}")
+            return
+        self.event_server = server
+        for srv in self.servers_list:
+            srv.event_sink = self.event_broker.publish
+
+    def _stop_event_stream(self):
+        for srv in self.servers_list:
+            srv.event_sink = None
+        if self.event_server:
+            self.event_server.stop()
+            self.event_server = None
+
     def _create_server_tab(self, srv: ServerData):
         """Cria uma aba para o servidor."""
         frame = ttk.Frame(self.notebook)
         self.notebook.add(frame, text=f"Porta {srv.port}")
 
+        # Formato de exibição/edição dos registers
+        fmt = self.server_formats.setdefault(srv.port, {"data_type": DEFAULT_TYPE, "order": DEFAULT_ORDER})
+        fmt_frame = ttk.Frame(frame)
+        fmt_frame.pack(side="top", fill="x")
+        ttk.Label(fmt_frame, text="Formato:").pack(side="left", padx=5)
+        type_cb = ttk.Combobox(fmt_frame, values=list(DATA_TYPES), state="readonly", width=8)
+        type_cb.set(fmt["data_type"])
+        type_cb.pack(side="left", padx=5)
+        ttk.Label(fmt_frame, text="Ordem:").pack(side="left", padx=5)
+        order_cb = ttk.Combobox(fmt_frame, values=list(ORDERS), state="readonly", width=6)
+        order_cb.set(fmt["order"])
+        order_cb.pack(side="left", padx=5)
+
         columns = ("address", "type", "write_val", "read_val")
         tree = ttk.Treeview(frame, columns=columns, show="headings", height=15)
         tree.heading("address", text="Endereço")
@@ -197,11 +327,53 @@ class ModbusApp(tk.Tk):
         for i in range(srv.num_coils):
             tree.insert("", "end", values=(i, "Coil", srv.coils[i], srv.coils[i]))
         # Preenche registers
+        display = self._register_display(srv)
         for i in range(srv.num_registers):
-            tree.insert("", "end", values=(i, "Register", srv.registers[i], srv.registers[i]))
+            tree.insert("", "end", values=(i, "Register", display[i], display[i]))
 
         tree.bind("<Double-1>", lambda e, t=tree, s=srv: self._on_edit_cell(e, t, s))
 
+        def on_format(_):
+            fmt["data_type"] = type_cb.get()
+            fmt["order"] = order_cb.get()
+            self._refresh_register_rows(tree, srv, columns=(2, 3))
+
+        type_cb.bind("<<ComboboxSelected>>", on_format)
+        order_cb.bind("<<ComboboxSelected>>", on_format)
+
+    def _register_display(self, srv: ServerData):
+        """
+        Decodifica todos os registers do servidor no formato selecionado, em uma passada.
+        Retorna uma lista (um texto por endereço); valores de várias words aparecem
+        no primeiro endereço, os seguintes ficam vazios.
+        """
+        fmt = self.server_formats.get(srv.port, {"data_type": DEFAULT_TYPE, "order": DEFAULT_ORDER})
+        dt, order = fmt["data_type"], fmt["order"]
+        if dt == DEFAULT_TYPE:
+            return list(srv.registers)
+        if dt == "string":
+            return [decode(dt, [w], order) for w in srv.registers]
+        size = word_count(dt)
+        display = [""] * srv.num_registers
+        for k, val in enumerate(decode(dt, srv.registers, order)):
+            display[k * size] = format_value(dt, val)
+        # Registers finais que não completam um valor ficam brutos
+        for i in range(srv.num_registers - srv.num_registers % size, srv.num_registers):
+            display[i] = srv.registers[i]
+        return display
+
+    def _refresh_register_rows(self, tree, srv: ServerData, columns=(3,)):
+        """Atualiza as colunas indicadas das linhas de registers."""
+        display = self._register_display(srv)
+        items = tree.get_children()
+        offset = srv.num_coils
+        for i in range(srv.num_registers):
+            item_id = items[offset + i]
+            row_vals = list(tree.item(item_id, "values"))
+            for col in columns:
+                row_vals[col] = display[i]
+            tree.item(item_id, values=row_vals)
+
     def _on_edit_cell(self, event, tree, srv: ServerData):
         """Edição do valor (coluna 'Valor (Edição)') via duplo clique."""
         item_id = tree.identify_row(event.y)
@@ -214,6 +386,14 @@ class ModbusApp(tk.Tk):
         type_ = vals[1]
 
         x, y, w, h = tree.bbox(item_id, col)
+        if type_ == "Register":
+            # Valores de várias words são editados a partir do primeiro endereço do valor
+            fmt = self.server_formats.get(srv.port, {"data_type": DEFAULT_TYPE, "order": DEFAULT_ORDER})
+            size = word_count(fmt["data_type"])
+            if address < srv.num_registers - srv.num_registers % size:
+                address -= address % size
+                item_id = tree.get_children()[srv.num_coils + address]
+                vals = list(tree.item(item_id, "values"))
         edit_win = tk.Toplevel(self)
         edit_win.overrideredirect(True)
         edit_win.geometry(f"{w}x{h}+{tree.winfo_rootx()+x}+{tree.winfo_rooty()+y}")
@@ -224,11 +404,31 @@ class ModbusApp(tk.Tk):
         entry.focus()
 
         def on_commit(_):
-            new_val = safe_get_int(var_str.get())
+            fmt = self.server_formats.get(srv.port, {"data_type": DEFAULT_TYPE, "order": DEFAULT_ORDER})
             if type_ == "Coil":
-                srv.update_coil(address, new_val)
+                new_val = safe_get_int(var_str.get())
+                srv.update_coil(address, new_val, "ui")
+            elif fmt["data_type"] == DEFAULT_TYPE:
+                new_val = safe_get_int(var_str.get())
+                srv.update_register(address, new_val, "ui")
+            elif address >= srv.num_registers - srv.num_registers % word_count(fmt["data_type"]):
+                # Registers finais que não completam um valor são editados brutos
+                new_val = safe_get_int(var_str.get())
+                srv.update_register(address, new_val, "ui")
             else:
-                srv.update_register(address, new_val)
+                dt = fmt["data_type"]
+                try:
+                    typed = parse_value(dt, var_str.get())
+                    ok = srv.write_typed(address, dt, typed if dt == "string" else [typed], fmt["order"], "ui")
+                except ValueError as e:
+                    edit_win.destroy()
+                    messagebox.showerror("Erro", f"Valor inválido para {dt}: {e}")
+                    return
+                if not ok:
+                    edit_win.destroy()
+                    messagebox.showerror("Erro", f"{dt} não cabe a partir do endereço {address}.")
+                    return
+                new_val = format_value(dt, typed)
             vals[2] = new_val
             tree.item(item_id, values=vals)
             edit_win.destroy()
@@ -263,14 +463,11 @@ class ModbusApp(tk.Tk):
                     row_vals[3] = srv.coils[i]  # read_val
                     tree.item(item_id, values=row_vals)
 
-                # Registers
-                offset = srv.num_coils
-                for i in range(srv.num_registers):
-                    item_id = items[offset + i]
-                    row_vals = list(tree.item(item_id, "values"))
-                    row_vals[3] = srv.registers[i]
-                    tree.item(item_id, values=row_vals)
+                # Registers (no formato selecionado)
+                self._refresh_register_rows(tree, srv)
 
+            if self.admission_label:
+                self.admission_label.config(text=self._admission_text())
             time.sleep(0.5)
 
     # ------------------------------------------------------
@@ -285,12 +482,26 @@ class ModbusApp(tk.Tk):
             return
         with open(fp, "w", newline="", encoding="utf-8") as f:
             w = csv.writer(f, delimiter=";")
-            w.writerow(["Port", "Type", "Address", "Value"])
+            w.writerow(["Port", "Type", "Address", "Value", "DataType", "Order"])
             for srv in self.servers_list:
+                fmt = self.server_formats.get(srv.port, {"data_type": DEFAULT_TYPE, "order": DEFAULT_ORDER})
                 for i, val in enumerate(srv.coils):
-                    w.writerow([srv.port, "Coil", i, val])
-                for i, val in enumerate(srv.registers):
-                    w.writerow([srv.port, "Register", i, val])
+                    w.writerow([srv.port, "Coil", i, val, "", ""])
+                # Registers no formato selecionado; os que não completam um valor, ou cujo
+                # texto não reproduz as mesmas words (ex.: string não imprimível), vão brutos
+                dt, order = fmt["data_type"], fmt["order"]
+                size = word_count(dt)
+                regs = srv.registers
+                for i in range(srv.num_registers):
+                    if dt != DEFAULT_TYPE and i % size == 0 and i + size <= srv.num_registers:
+                        text = exact_text(dt, regs[i:i + size], order)
+                        if text is not None:
+                            w.writerow([srv.port, "Register", i, text, dt, order])
+                            continue
+                        for k in range(size):
+                            w.writerow([srv.port, "Register", i + k, regs[i + k], DEFAULT_TYPE, DEFAULT_ORDER])
+                    elif dt == DEFAULT_TYPE or i >= srv.num_registers - srv.num_registers % size:
+                        w.writerow([srv.port, "Register", i, regs[i], DEFAULT_TYPE, DEFAULT_ORDER])
         messagebox.showinfo("Sucesso", f"Salvo em {fp}")
 
     def import_servers_csv(self):
@@ -305,35 +516,49 @@ class ModbusApp(tk.Tk):
                     p = safe_get_int(row["Port"])
                     t = row["Type"]
                     a = safe_get_int(row["Address"])
-                    v = safe_get_int(row["Value"])
+                    dt = row.get("DataType") or DEFAULT_TYPE
+                    order = row.get("Order") or DEFAULT_ORDER
                     if p not in data_dict:
-                        data_dict[p] = {"max_coil": -1, "max_reg": -1, "coils": {}, "regs": {}}
+                        data_dict[p] = {"max_coil": -1, "max_reg": -1, "coils": {}, "regs": {}, "format": None}
                     if t == "Coil":
+                        v = safe_get_int(row["Value"])
                         data_dict[p]["coils"][a] = v
                         if a > data_dict[p]["max_coil"]:
                             data_dict[p]["max_coil"] = a
-                    else:
+                    elif dt == DEFAULT_TYPE:
+                        v = safe_get_int(row["Value"])
                         data_dict[p]["regs"][a] = v
                         if a > data_dict[p]["max_reg"]:
                             data_dict[p]["max_reg"] = a
+                    else:
+                        v = parse_value(dt, row["Value"])
+                        words = encode(dt, v if dt == "string" else [v], order)
+                        for k, word in enumerate(words):
+                            data_dict[p]["regs"][a + k] = word
+                        if a + len(words) - 1 > data_dict[p]["max_reg"]:
+                            data_dict[p]["max_reg"] = a + len(words) - 1
+                        data_dict[p]["format"] = {"data_type": dt, "order": order}
         except Exception as e:
             messagebox.showerror("Erro", f"Falha ao ler CSV: {e}")
             return
 
         self.stop_servers()
+        self._reset_admission()
         for port, info in data_dict.items():
             c_count = info["max_coil"] + 1 if info["max_coil"] >= 0 else 0
             r_count = info["max_reg"] + 1 if info["max_reg"] >= 0 else 0
-            srv = ServerData(port, c_count, r_count)
+            srv = ServerData(port, c_count, r_count, self._server_admission())
             for k, val in info["coils"].items():
-                srv.coils[k] = 1 if val != 0 else 0
+                srv.update_coil(k, val)
             for k, val in info["regs"].items():
-                srv.registers[k] = val
+                srv.update_register(k, val)
             try:
                 srv.start()
             except Exception as e:
                 messagebox.showerror("Erro", f"Não foi possível iniciar servidor na porta {port}: {e}")
                 continue
+            if info["format"]:
+                self.server_formats[port] = info["format"]
             self.servers_list.append(srv)
             self._create_server_tab(srv)
 
@@ -342,8 +567,9 @@ class ModbusApp(tk.Tk):
             self.btn_random.configure(state="normal")
             self.interval_entry.configure(state="normal")
             self.btn_simular.configure(state="normal")
+            self._start_event_stream()
 
-            self.update_thread = threading.Thread(target=self.update_loop, daemon=True)
+            self.update_thread = threading.Thread(target=self.update_loop, name="update_loop", daemon=True)
             self.update_thread.start()
 
     # ------------------------------------------------------
@@ -356,6 +582,7 @@ class ModbusApp(tk.Tk):
             # Iniciar random
             self.random_active = True
             self.btn_random.config(text="Parar Aleatório")
+            self.random_rng = self._make_rng()
             interval = self.random_interval_ms.get()
             self.random_thread = threading.Thread(target=self._random_loop, args=(interval,), daemon=True)
             self.random_thread.start()
@@ -365,14 +592,30 @@ class ModbusApp(tk.Tk):
             self.btn_random.config(text="Aleatório")
             # Zera todos
             for srv in self.servers_list:
-                srv.set_all_zero()
+                srv.set_all_zero("random")
 
     def _random_loop(self, interval_ms):
         while self.random_active:
-            for srv in self.servers_list:
-                srv.set_random_values()
+            # Com relógio virtual, a simulação agenda a geração aleatória na própria linha do tempo
+            with self.random_lock:
+                if not (self.sim_running and self.sim_clock.virtual):
+                    for srv in self.servers_list:
+                        srv.set_random_values(self.random_rng)
             time.sleep(interval_ms / 1000.0)
 
+    def _make_rng(self):
+        """
+        Cria o gerador aleatório a partir da semente (vazia = não determinístico).
+        Sementes numéricas viram int; qualquer outro texto é usado como string.
+        """
+        seed = self.random_seed.get().strip()
+        if not seed:
+            return random.Random()
+        try:
+            return random.Random(int(seed))
+        except ValueError:
+            return random.Random(seed)
+
     # ------------------------------------------------------
     #                    Simulação
     # ------------------------------------------------------
@@ -398,6 +641,10 @@ class ModbusApp(tk.Tk):
         ttk.Button(top_frame, text="Salvar CSV", command=self.save_sim_csv).pack(side="left", padx=5)
         ttk.Button(top_frame, text="Importar CSV", command=self.import_sim_csv).pack(side="left", padx=5)
 
+        # Velocidade: 1 = tempo real, N = N× mais rápido, 0 = salto direto ao próximo evento
+        ttk.Label(top_frame, text="Velocidade:").pack(side="left", padx=5)
+        tk.Entry(top_frame, textvariable=self.sim_speed, width=6).pack(side="left", padx=5)
+
         # Botão de condição (Adicionar/Remover)
         self.btn_condition = ttk.Button(top_frame, text="Adicionar Condição", command=self.toggle_condition)
         self.btn_condition.pack(side="left", padx=5)
@@ -414,13 +661,15 @@ class ModbusApp(tk.Tk):
         self.condition_label.pack()
 
         # ---------- TABELA (TreeView) ----------
-        columns = ("server_port", "type", "address", "value", "time_ms")
+        columns = ("server_port", "type", "address", "value", "time_ms", "data_type", "order")
         self.sim_tree = ttk.Treeview(sim_frame, columns=columns, show="headings", height=10)
         self.sim_tree.heading("server_port", text="Servidor (Port)")
         self.sim_tree.heading("type", text="Tipo")
         self.sim_tree.heading("address", text="Endereço")
         self.sim_tree.heading("value", text="Valor")
         self.sim_tree.heading("time_ms", text="Tempo (ms)")
+        self.sim_tree.heading("data_type", text="Formato")
+        self.sim_tree.heading("order", text="Ordem")
 
         for col in columns:
             self.sim_tree.column(col, anchor="center", width=100)
@@ -457,12 +706,26 @@ class ModbusApp(tk.Tk):
         tm_var = tk.StringVar(value="1000")
         tk.Entry(win, textvariable=tm_var).grid(row=4, column=1, padx=5, pady=5)
 
+        tk.Label(win, text="Formato (Register):").grid(row=5, column=0, sticky="e", padx=5, pady=5)
+        dt_var = tk.StringVar(value=DEFAULT_TYPE)
+        ttk.Combobox(win, textvariable=dt_var, values=list(DATA_TYPES), state="readonly").grid(row=5, column=1, padx=5, pady=5)
+
+        tk.Label(win, text="Ordem:").grid(row=6, column=0, sticky="e", padx=5, pady=5)
+        od_var = tk.StringVar(value=DEFAULT_ORDER)
+        ttk.Combobox(win, textvariable=od_var, values=list(ORDERS), state="readonly").grid(row=6, column=1, padx=5, pady=5)
+
         def on_ok():
             port = safe_get_int(sv_var.get())
             t = tp_var.get()
             addr = safe_get_int(ad_var.get())
-            val = safe_get_int(vl_var.get())
             ms = safe_get_int(tm_var.get())
+            dt = dt_var.get() if t == "Register" else ""
+            order = od_var.get() if t == "Register" else ""
+            try:
+                val = parse_point_value(t, dt, vl_var.get())
+            except ValueError as e:
+                messagebox.showerror("Erro", f"Valor inválido para {dt}: {e}")
+                return
             srv = self._find_server_by_port(port)
             if not srv:
                 messagebox.showerror("Erro", f"Servidor na porta {port} não existe.")
@@ -470,14 +733,14 @@ class ModbusApp(tk.Tk):
             if t == "Coil" and (addr<0 or addr>=srv.num_coils):
                 messagebox.showerror("Erro", f"Endereço coil inválido (0..{srv.num_coils-1})")
                 return
-            if t == "Register" and (addr<0 or addr>=srv.num_registers):
-                messagebox.showerror("Erro", f"Endereço register inválido (0..{srv.num_registers-1})")
+            if t == "Register" and not point_fits(srv, t, addr, dt, val):
+                messagebox.showerror("Erro", f"Endereço register inválido (0..{srv.num_registers-1}) para {dt}")
                 return
 
-            self.sim_tree.insert("", "end", values=(port, t, addr, val, ms))
+            self.sim_tree.insert("", "end", values=(port, t, addr, val, ms, dt, order))
             win.destroy()
 
-        tk.Button(win, text="OK", command=on_ok).grid(row=5, column=0, columnspan=2, pady=10)
+        tk.Button(win, text="OK", command=on_ok).grid(row=7, column=0, columnspan=2, pady=10)
 
     def remove_sim_point(self):
         sel = self.sim_tree.selection()
@@ -492,42 +755,45 @@ class ModbusApp(tk.Tk):
         self.sim_data = []
         for it in items:
             vals = self.sim_tree.item(it, "values")
+            try:
+                value = parse_point_value(vals[1], vals[5], vals[3])
+            except ValueError:
+                continue
             self.sim_data.append({
                 "port": safe_get_int(vals[0]),
                 "type": vals[1],
                 "address": safe_get_int(vals[2]),
-                "value": safe_get_int(vals[3]),
+                "value": value,
                 "time_ms": safe_get_int(vals[4]),
+                "data_type": vals[5] or DEFAULT_TYPE,
+                "order": vals[6] or DEFAULT_ORDER,
             })
         self.sim_data.sort(key=lambda x: x["time_ms"])
+        self.sim_clock = make_clock(safe_get_float(self.sim_speed.get(), 1.0))
+        # Com relógio virtual, a geração aleatória ativa passa a ser agendada pela simulação
+        self.sim_random_interval = 0
+        if self.random_active and self.sim_clock.virtual:
+            self.sim_random_interval = self.random_interval_ms.get()
+            # Gerador próprio da simulação: um tick em andamento não consome dele
+            self.sim_rng = self._make_rng()
         self.sim_running = True
         self.sim_thread = threading.Thread(target=self._sim_loop, daemon=True)
         self.sim_thread.start()
 
     def _sim_loop(self):
-        # 1) Se houver condição, aguardar até ser satisfeita
-        if self.sim_condition:
-            while self.sim_running and not self._condition_satisfied():
-                time.sleep(0.1)
-
-        # 2) Executar os eventos
-        start_time = time.time() * 1000
-        idx = 0
-        while self.sim_running and idx < len(self.sim_data):
-            current_ms = time.time()*1000 - start_time
-            if current_ms >= self.sim_data[idx]["time_ms"]:
-                d = self.sim_data[idx]
-                srv = self._find_server_by_port(d["port"])
-                if srv:
-                    if d["type"] == "Coil":
-                        srv.update_coil(d["address"], d["value"])
-                    else:
-                        srv.update_register(d["address"], d["value"])
-                idx += 1
-            else:
-                time.sleep(0.02)
-
-        self.sim_running = False
+        servers = {s.port: s for s in self.servers_list}
+        if self.sim_random_interval:
+            # Espera o tick do _random_loop em andamento; os seguintes já veem sim_running
+            with self.random_lock:
+                pass
+        try:
+            run_scenario(servers, self.sim_data, self.sim_clock,
+                         condition=self.sim_condition,
+                         random_interval_ms=self.sim_random_interval,
+                         rng=self.sim_rng,
+                         keep_running=lambda: self.sim_running)
+        finally:
+            self.sim_running = False
 
     def stop_simulation(self):
         self.sim_running = False
@@ -547,7 +813,7 @@ class ModbusApp(tk.Tk):
             return
         with open(fp, "w", newline="", encoding="utf-8") as f:
             w = csv.writer(f, delimiter=";")
-            w.writerow(["Port","Type","Address","Value","Time_ms"])
+            w.writerow(["Port","Type","Address","Value","Time_ms","DataType","Order"])
             for it in self.sim_tree.get_children():
                 vals = self.sim_tree.item(it,"values")
                 w.writerow(vals)
@@ -561,22 +827,12 @@ class ModbusApp(tk.Tk):
         if not fp:
             return
         try:
-            with open(fp,"r",encoding="utf-8") as f:
-                reader = csv.DictReader(f, delimiter=";")
-                for row in reader:
-                    port = safe_get_int(row["Port"])
-                    t = row["Type"]
-                    addr = safe_get_int(row["Address"])
-                    val = safe_get_int(row["Value"])
-                    ms = safe_get_int(row["Time_ms"])
-                    srv = self._find_server_by_port(port)
-                    if not srv:
-                        continue
-                    if t=="Coil" and addr>=srv.num_coils:
-                        continue
-                    if t=="Register" and addr>=srv.num_registers:
-                        continue
-                    self.sim_tree.insert("", "end", values=(port,t,addr,val,ms))
+            for d in read_scenario_csv(fp):
+                srv = self._find_server_by_port(d["port"])
+                if not srv or not point_fits(srv, d["type"], d["address"], d["data_type"], d["value"]):
+                    continue
+                self.sim_tree.insert("", "end", values=(d["port"], d["type"], d["address"], d["value"],
+                                                        d["time_ms"], d["data_type"], d["order"]))
         except Exception as e:
             messagebox.showerror("Erro",f"Falha ao importar simulação: {e}")
 
@@ -665,24 +921,3 @@ class ModbusApp(tk.Tk):
         return (f"Execução pela condição: Servidor={cond['port']} "
                 f"({cond['type']}[{cond['address']}]) "
                 f"{cond['operator']} {cond['value']}")
-
-    def _condition_satisfied(self):
-        if not self.sim_condition:
-            return True
-        c = self.sim_condition
-        srv = self._find_server_by_port(c["port"])
-        if not srv:
-            return False
-        srv.read_all()
-        if c["type"]=="Coil":
-            val = srv.coils[c["address"]]
-        else:
-            val = srv.registers[c["address"]]
-
-        if c["operator"]=="=":
-            return val == c["value"]
-        elif c["operator"]==">":
-            return val > c["value"]
-        elif c["operator"]=="<":
-            return val < c["value"]
-        return False